@@ -55,23 +55,28 @@ Send Control Change, channel : 1, number : 48, value 54
 import argparse
 import asyncio
 import logging
-import sys
 from pathlib import Path
 
 import mido
 import confuse
 import coloredlogs
 import pyxair
-import contextlib
+from dataclasses import dataclass, field
 
 DEFAULT_CONFIG = Path(__file__).parent / "midi.yaml"
 
-BUTTON_IXES = [
+logger = logging.getLogger('midi')
+
+BUTTON_IXES = (
     89, 90, 40, 41, 42, 43, 44, 45,
     87, 88, 91, 92, 86, 93, 94, 95
-]
+)
+
+LAYER_BUTTONS = (84, 85)
+
+ENCODER_PUSH_NOTES = range(32, 40)
 
-LAYER_BUTTONS = [84, 85]
+ENCODER_RING_CONTROLS = range(48, 56)
 
 ENCODER_STYLES = {
     "single": (1, 11),
@@ -80,46 +85,180 @@ ENCODER_STYLES = {
     "spread": (49, 5),
 }
 
-PITCH_LIMITS = [ -8192, 8096 ]
+DEFAULT_ENCODER_STYLE = "single"
+
+PITCH_LIMITS = ( -8192, 8191 )
+
+# Maps a pitch onto the 0-1 fader range as (pitch - PITCH_MIN) * PITCH_SCALE
+PITCH_MIN = PITCH_LIMITS[0]
+PITCH_SCALE = 1.0 / (PITCH_LIMITS[1] - PITCH_LIMITS[0])
+
+# MIDI status bytes (high nibble, any channel)
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+PITCHWHEEL = 0xE0
 
 ZERO_VOLUME = 0.750
 
-OSC_CACHE = {}
+# Distance from ZERO_VOLUME within which the main wheel snaps onto it
+FADER_DETENT = 0.025
+
+# Decoded MIDI inputs waiting to be handled; older ones are dropped beyond this
+MIDI_QUEUE_SIZE = 64
+
+# Time (in seconds) over which the ticks of an encoder are summed into a single OSC update
+ENCODER_FLUSH_DELAY = 0.010
+
+# Encoder updates smaller than this are not sent to the mixer
+ENCODER_MIN_CHANGE = 1e-6
+
+# Blink period (in seconds) of active mute groups, and polling period while none is active
+MUTEGROUP_BLINK_INTERVAL = 0.243
+MUTEGROUP_IDLE_INTERVAL = 0.5
+
+# Meter bank subscribed to on the mixer, and the OSC addresses its levels arrive on
+METER_ID = 1
+METER_ADDRS = frozenset({f"/meters/{METER_ID}"})
+
+METER_THRESHOLD = 0.5
 
-ACTIVE_KEYS = set()
+# Kinds of controls an OSC address can be shown on
+BUTTON = "button"
+ENCODER = "encoder"
 
-CURRENT_LAYER = 0
 
-METER_CACHE = {}
+@dataclass
+class LayerState:
+    """Plain-Python snapshot of a configured layer, resolved once at startup."""
+    encoders: list[str | None]
+    buttons: list[str | None]
+    mutegroups: list[str | None]
+    meter_notes: list[tuple[int, int]]
+    address_map: dict[str, tuple[str, int]]
+    mutegroup_ixes: dict[str, tuple[int, ...]]
+    enable_zero: bool
+    invert_buttons: bool
+    encoder_base: int
+    encoder_span: int
+    # Value change per encoder tick, and distance from ZERO_VOLUME that snaps onto it
+    encoder_step: float
+    encoder_detent: float
 
-MUTEGROUP_BUTTONS = {}
 
+def _get_optional(view, template, default):
+    try:
+        return view.get(template)
+    except confuse.NotFoundError:
+        return default
+
+def _address_map(buttons, encoders):
+    """Map each OSC address to the (kind, MIDI note/control) of the control showing it."""
+    lookup = {}
+    for kind, addresses, outputs in ((BUTTON, buttons, BUTTON_IXES), (ENCODER, encoders, ENCODER_RING_CONTROLS)):
+        for ix, address in enumerate(addresses):
+            if address:
+                # Keep the first index of repeated addresses, like list.index() did
+                lookup.setdefault(address, (kind, outputs[ix]))
+    return lookup
+
+def _mutegroup_ixes(mutegroups):
+    # The same mute group may light up several buttons
+    lookup = {}
+    for ix, address in enumerate(mutegroups):
+        if address:
+            lookup[address] = lookup.get(address, ()) + (ix,)
+    return lookup
 
-async def create_osc_cache(configuration, xair):
-    global OSC_CACHE, ACTIVE_KEYS
+def build_layer_states(configuration) -> list[LayerState]:
+    states = []
 
-    keys = []
+    for layer in configuration['layers']:
+        encoders = layer['encoders'].get(confuse.Sequence(confuse.Optional(str)))
+        buttons = layer['buttons'].get(confuse.Sequence(confuse.Optional(str)))
+        mutegroups = _get_optional(layer['mutegroups'], confuse.Sequence(confuse.Optional(str)), [])
+        meters = _get_optional(layer['meters'], confuse.Sequence(confuse.Optional(int)), [])
 
+        style_name = _get_optional(layer['encoder_style'], str, DEFAULT_ENCODER_STYLE)
+        if style_name not in ENCODER_STYLES:
+            logging.warning(f"Unknown encoder style: {style_name}")
+        base, span = ENCODER_STYLES.get(style_name, ENCODER_STYLES[DEFAULT_ENCODER_STYLE])
+        sensitivity = layer['encoder_sensitivity'].get(float)
+
+        states.append(LayerState(
+            encoders=encoders,
+            buttons=buttons,
+            mutegroups=mutegroups,
+            # (meter source, note) for the second row of buttons
+            meter_notes=[(meter, note) for meter, note in zip(meters, BUTTON_IXES[8:]) if meter is not None],
+            address_map=_address_map(buttons, encoders),
+            mutegroup_ixes=_mutegroup_ixes(mutegroups),
+            enable_zero=_get_optional(layer['enable_zero'], bool, False),
+            invert_buttons=_get_optional(layer['invert_buttons'], bool, False),
+            encoder_base=base,
+            encoder_span=span,
+            encoder_step=sensitivity / 1000.0,
+            encoder_detent=sensitivity / 1500.0,
+        ))
+
+    return states
+
+
+def raw_meter_threshold(threshold: float) -> float:
+    """Express a meter threshold in the mixer's raw signed 16-bit meter units."""
+    return (threshold - 1) * 32768.0
+
+@dataclass
+class State:
+    """Everything shared by the handlers, created once in main and passed to each of them."""
+    layers: list[LayerState]
+    # OSC address driven by the main wheel
+    big_fader: str | None = None
+    meter_raw_threshold: float = raw_meter_threshold(METER_THRESHOLD)
+    current_layer: int = 0
+    # Values of every active address; the current layer's live in current_layer_state
+    osc_cache: dict[str, float] = field(default_factory=dict)
+    # Values of the current layer's addresses (None until known), swapped in on switch_layer
+    current_layer_state: dict[str, float | None] = field(default_factory=dict)
+    active_keys: frozenset[str] = frozenset()
+    mutegroup_buttons: dict[int, float] = field(default_factory=dict)
+    # Encoder value changes waiting to be flushed to the mixer, per OSC address
+    pending_encoder: dict[str, float] = field(default_factory=dict)
+    # Last velocity/value sent to the controller per note/control, to skip redundant sends
+    last_sent_note: dict[int, int] = field(default_factory=dict)
+    last_sent_cc: dict[int, int] = field(default_factory=dict)
+
+
+async def create_osc_cache(state: State, xair):
+    """Fetch the initial values of every address used by any layer, all at once.
+
+    Only called at startup: osc_handler keeps the cache live afterwards, so layer
+    switches never need to go back to the mixer.
+    """
     xair._cache = {}
+
+    keys = {
+        key
+        for layer in state.layers
+        for key in layer.encoders + layer.buttons + layer.mutegroups
+        if key
+    }
+    state.active_keys = frozenset(keys)
+
+    # Values already cached are kept live by osc_handler, only fetch the rest
+    missing = [key for key in keys if key not in state.osc_cache]
+    results = await asyncio.gather(*(xair.get(key) for key in missing), return_exceptions=True)
+
+    for key, result in zip(missing, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Failed to get initial OSC value for {key}: {result}")
+        else:
+            state.osc_cache[key] = result.arguments[0]
     
-    layers = configuration['layers']
-    for layer in layers:
-        keys += layer['encoders'].get(confuse.Sequence(confuse.Optional(str)))
-        keys += layer['buttons'].get(confuse.Sequence(confuse.Optional(str)))
-        keys += layer['mutegroups'].get(confuse.Sequence(confuse.Optional(str)))
-    
-    for key in keys:
-        if key:
-            ACTIVE_KEYS.add(key)
-            try:
-                message = await xair.get(key)
-                OSC_CACHE[key] = message.arguments[0]
-            except Exception as exc:
-                logging.error(f"Failed to get initial OSC value for {key}: {exc}")
-    
-    logging.debug(f"Initialized OSC cache with: {OSC_CACHE}")
+    logger.debug("Initialized OSC cache with: %s", state.osc_cache)
 
 class EncoderInput:
+    __slots__ = ('index', 'diff')
+
     def __init__(self, zero_index: int, diff: float):
         self.index = zero_index
         self.diff = diff
@@ -128,6 +267,8 @@ class EncoderInput:
         return f"EncoderInput(index={self.index}, diff={self.diff})"
     
 class ButtonInput:
+    __slots__ = ('row', 'col')
+
     def __init__(self, zero_index_row, zero_index_col):
         self.row = zero_index_row
         self.col = zero_index_col
@@ -136,6 +277,8 @@ class ButtonInput:
         return f"ButtonInput(row={self.row}, col={self.col})"
     
 class LayerSwitchInput:
+    __slots__ = ('layer_index',)
+
     def __init__(self, layer_index):
         self.layer_index = layer_index
 
@@ -143,329 +286,418 @@ class LayerSwitchInput:
         return f"LayerSwitchInput(layer_index={self.layer_index})"
     
 class FaderInput:
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
     def __repr__(self):
         return f"FaderInput(value={self.value})"
 
-def midi_to_input(message):
-    if message.type == 'control_change':
-        index = message.control - 16
-        diff = message.value
-        if diff > 64:
-            diff = - (diff - 64)
-        return EncoderInput(zero_index=index, diff=diff)
-    elif message.type == 'note_on':
-        if message.velocity != 127:
-            return None
-        
-        if message.note in LAYER_BUTTONS:
-            layer_index = LAYER_BUTTONS.index(message.note)
-            return LayerSwitchInput(layer_index=layer_index)
-
-        if message.note in BUTTON_IXES:
-            ix = BUTTON_IXES.index(message.note)
-            row = ix // 8 + 1
-            col = ix % 8
-            return ButtonInput(zero_index_row=row, zero_index_col=col)
-        elif message.note >= 32 and message.note <= 39:
-            # Top encoder push
-            index = message.note - 32
-            return ButtonInput(zero_index_row=0, zero_index_col=index)
-    elif message.type == 'pitchwheel':
-        min_pitch, max_pitch = PITCH_LIMITS
-        value = (message.pitch - min_pitch) / (max_pitch - min_pitch)
-        return FaderInput(value=value)
-
-    logging.warning(f"Unhandled MIDI message: {message}")
+def _build_note_table():
+    # Inputs for these notes never change, so they are built once
+    table = [None] * 128
+    for ix, note in enumerate(BUTTON_IXES):
+        table[note] = ButtonInput(zero_index_row=ix // 8 + 1, zero_index_col=ix % 8)
+    for ix, note in enumerate(ENCODER_PUSH_NOTES):
+        # Top encoder push
+        table[note] = ButtonInput(zero_index_row=0, zero_index_col=ix)
+    for ix, note in enumerate(LAYER_BUTTONS):
+        table[note] = LayerSwitchInput(layer_index=ix)
+    return table
+
+NOTE_TABLE = _build_note_table()
+
+def _build_control_table():
+    # Top encoders send controls 16-23
+    table = [None] * 128
+    for ix in range(8):
+        table[16 + ix] = ix
+    return table
+
+CONTROL_TABLE = _build_control_table()
+
+# Encoder values are sign-magnitude: bit 6 set means turning down
+ENC_DELTA = [value if value < 64 else 64 - value for value in range(128)]
+
+def _unhandled(message):
+    logger.warning("Unhandled MIDI message: %s", message)
     return None
 
-async def handle_midi_input(input, configuration, xair, midiout):
-    global CURRENT_LAYER, OSC_CACHE
+def _decode_control_change(message):
+    index = CONTROL_TABLE[message[1]]
+    if index is None:
+        return _unhandled(message)
+    return EncoderInput(zero_index=index, diff=ENC_DELTA[message[2]])
+
+def _decode_note_on(message):
+    if message[2] != 127:
+        return None
+    return NOTE_TABLE[message[1]] or _unhandled(message)
+
+def _decode_pitchwheel(message):
+    pitch = (message[2] << 7 | message[1]) - 8192
+    return FaderInput(value=(pitch - PITCH_MIN) * PITCH_SCALE)
+
+MIDI_DECODERS = {
+    NOTE_ON: _decode_note_on,
+    CONTROL_CHANGE: _decode_control_change,
+    PITCHWHEEL: _decode_pitchwheel,
+}
+
+def midi_to_input(message):
+    """Decode a raw MIDI message, as the list of bytes delivered by rtmidi."""
+    decoder = MIDI_DECODERS.get(message[0] & 0xF0)
+    if decoder is None:
+        return _unhandled(message)
+    return decoder(message)
 
+async def handle_midi_input(state: State, input, xair, midiout):
     if isinstance(input, LayerSwitchInput):
         new_layer = input.layer_index
-        await create_osc_cache(configuration, xair)
-        await switch_layer(new_layer, configuration, midiout)
+        await switch_layer(state, new_layer, midiout)
     elif isinstance(input, ButtonInput):
+        layer = state.layers[state.current_layer]
+
         if input.row == 0:
             # Top encoder push
-            try:
-                # Check if top encoder enabled
-                enabled = configuration['layers'][CURRENT_LAYER]['enable_zero'].get(bool)
-                if not enabled:
-                    return
-            except confuse.NotFoundError:
+            if not layer.enable_zero:
                 return
 
-            layer = configuration['layers'][CURRENT_LAYER]
-            encoders = layer['encoders'].get(confuse.Sequence(confuse.Optional(str)))
-
-            address = encoders[input.col]
+            address = layer.encoders[input.col]
             if address:
                 xair.put(address, [ ZERO_VOLUME ])
         elif input.row == 1:
             # Top button push
-            layer = configuration['layers'][CURRENT_LAYER]
-            buttons = layer['buttons'].get(confuse.Sequence(confuse.Optional(str)))
-
-            address = buttons[input.col]
+            address = layer.buttons[input.col]
             if address:
-                value = not OSC_CACHE.get(address, False)
-                xair.put(address, [int(value)])
+                current = state.current_layer_state.get(address) or 0.0
+                new_value = 0 if current >= 0.5 else 1
+                xair.put(address, [new_value])
     elif isinstance(input, EncoderInput):
-        layer = configuration['layers'][CURRENT_LAYER]
-        encoders = layer['encoders'].get(confuse.Sequence(confuse.Optional(str)))
+        layer = state.layers[state.current_layer]
 
-        address = encoders[input.index]
+        address = layer.encoders[input.index]
         if address:
-            sensitivity = layer['encoder_sensitivity'].get(float)
-            current_value = (await xair.get(address)).arguments[0]
-
-            new_value = current_value + input.diff * sensitivity / 1000.0
-
-            # Implement a "detent"
-            if abs(new_value - ZERO_VOLUME) < (sensitivity / 1500.0):
-                new_value = ZERO_VOLUME
-
-            delta = new_value - current_value
-
-            logging.debug(f"MIDI to OSC: {input} -> {address}={new_value} (Δ = {delta})")
-
-            xair.put(address, [ new_value ])
+            pending = state.pending_encoder
+            if address not in pending:
+                asyncio.get_running_loop().call_later(ENCODER_FLUSH_DELAY, flush_encoder, state, address, layer.encoder_detent, xair)
+            pending[address] = pending.get(address, 0.0) + input.diff * layer.encoder_step
     elif isinstance(input, FaderInput):
-        fader_address = configuration['big_fader'].get(confuse.Optional(str))
+        fader_address = state.big_fader
         if fader_address:
             # Big detent
             value = input.value
-            if abs(value - ZERO_VOLUME) < 0.025:
+            if abs(value - ZERO_VOLUME) < FADER_DETENT:
                 value = ZERO_VOLUME
 
-            logging.debug(f"MIDI to OSC: {input} -> {fader_address}={value}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("MIDI to OSC: %s -> %s=%s", input, fader_address, value)
 
             xair.put(fader_address, [ value ])
 
+def flush_encoder(state: State, address, detent, xair):
+    """Send the encoder ticks accumulated for `address` to the mixer as one update."""
+    try:
+        diff = state.pending_encoder.pop(address, 0.0)
 
-def make_stream():
-    loop = asyncio.get_event_loop()
-    queue = asyncio.Queue()
+        # osc_handler keeps the cache live, so there is no need to ask the mixer
+        cache = state.current_layer_state if address in state.current_layer_state else state.osc_cache
+        current_value = cache.get(address)
+        if current_value is None:
+            current_value = ZERO_VOLUME
 
-    def callback(message):
-        loop.call_soon_threadsafe(queue.put_nowait, message)
+        new_value = current_value + diff
 
-    async def stream():
-        while True:
-            yield await queue.get()
+        # Implement a "detent"
+        if abs(new_value - ZERO_VOLUME) < detent:
+            new_value = ZERO_VOLUME
 
-    return callback, stream()
+        delta = new_value - current_value
+        if abs(delta) < ENCODER_MIN_CHANGE:
+            # e.g. ticks that stay within the detent
+            return
 
-async def monitor_midi(stream, output_queue: asyncio.Queue):
-    async for message in stream:
-        try:
-            input_event = midi_to_input(message)
-            logging.debug(f"MIDI IN: {message} -> {input_event}")
-            await output_queue.put(input_event)
-        except Exception as exc:
-            logging.error(f"Failed to process MIDI message {message}: {exc}")
-            continue
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MIDI to OSC: encoder %s=%s (Δ = %s)", address, new_value, delta)
+
+        xair.put(address, [ new_value ])
+
+        # Let the next flush build on this value without waiting for the mixer's echo,
+        # which osc_handler will reconcile the cache with
+        cache[address] = new_value
+    except Exception as exc:
+        logger.error("Failed to flush encoder %s: %s", address, exc)
+
+
+def put_latest(queue: asyncio.Queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Drop the stalest message so that the newest input always gets through
+        queue.get_nowait()
+        queue.put_nowait(message)
+
+def make_midi_callback(loop, queue: asyncio.Queue):
+    """Build an rtmidi callback that decodes messages and hands the inputs over to `queue` on `loop`.
+
+    The callback is installed on the rtmidi port directly, skipping mido's
+    Message parsing. Decoding runs on rtmidi's thread, so ignored messages
+    (e.g. button releases) never wake up the event loop.
+    """
+    # Bound once, as the callback runs on rtmidi's thread for every message
+    call_soon_threadsafe = loop.call_soon_threadsafe
+
+    def callback(event, data=None):
+        message, _delta_time = event
+        input_event = decode_midi(message)
+        if input_event is not None:
+            call_soon_threadsafe(put_latest, queue, input_event)
+
+    return callback
+
+def decode_midi(message):
+    try:
+        input_event = midi_to_input(message)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MIDI IN: %s -> %s", message, input_event)
+        return input_event
+    except Exception as exc:
+        logger.error("Failed to process MIDI message %s: %s", message, exc)
+        return None
 
-async def midi_event_handler(configuration, xair, midiout, queue):
+async def midi_event_handler(state: State, xair, midiout, queue):
     while True:
         input_event = await queue.get()
-        try:
-            await handle_midi_input(input_event, configuration, xair, midiout)
-        except Exception as exc:
-            logging.error(f"Failed to handle MIDI input {input_event}: {exc}")
-            continue
 
-async def osc_queue(queue):
-    while True:
         try:
-            message = await asyncio.wait_for(queue.get(), timeout=None)
-
-            if message.address in ACTIVE_KEYS:
-                OSC_CACHE[message.address] = message.arguments[0]
-                yield message
+            await handle_midi_input(state, input_event, xair, midiout)
         except Exception as exc:
-            logging.error(f"Failed to process OSC message: {exc}")
-            await asyncio.sleep(0.2)
-            continue
+            logger.error("Failed to handle MIDI input %s: %s", input_event, exc)
+
+async def osc_handler(state: State, xair, midiout):
+    # These are only mutated (never rebound) once the OSC cache is created
+    current_state = state.current_layer_state
+    active_keys = state.active_keys
+    osc_cache = state.osc_cache
+    meter_addrs = METER_ADDRS
 
-async def osc_handler(configuration, xair, midiout):
     with xair.subscribe(meters=True) as stream:
         while True:
             try:
-                message = await asyncio.wait_for(stream.get(), timeout=None)
+                message = await stream.get()
+                address = message.address
 
-                if message.address.startswith("/meters/"):
-                    await handle_meters(message, configuration, midiout)
+                # Meters are by far the busiest, so they are checked first
+                if address in meter_addrs:
+                    await handle_meters(state, message, midiout)
                     # logging.debug(f"Number of meters subscribed: {len(message.arguments)}")
-                elif message.address in ACTIVE_KEYS:
-                    OSC_CACHE[message.address] = message.arguments[0]
-                    osc_to_midi(message.address, message.arguments[0], configuration, midiout)
+                elif address in current_state:
+                    value = message.arguments[0]
+                    current_state[address] = value
+                    osc_to_midi(state, address, value, midiout)
+                elif address in active_keys:
+                    # Other layers only need the value once they are switched to
+                    osc_cache[address] = message.arguments[0]
             except Exception as exc:
-                logging.error(f"Failed to process OSC message in handler: {exc}")
+                logger.error("Failed to process OSC message in handler: %s", exc)
                 await asyncio.sleep(0.2)
 
-def osc_to_midi(address, value, configuration, midiout):
-    global OSC_CACHE, CURRENT_LAYER
+def send_batch(midiout, batch):
+    """Write several raw messages to the rtmidi port while taking mido's port lock only once."""
+    with midiout._lock:
+        send_message = midiout._rt.send_message
+        for data in batch:
+            send_message(data)
+
+def send_note_on(midiout, note, velocity):
+    midi_msg = (NOTE_ON, note, velocity)
+    midiout._rt.send_message(midi_msg)
+    return midi_msg
+
+def send_cc(midiout, control, value):
+    midi_msg = (CONTROL_CHANGE, control, value)
+    midiout._rt.send_message(midi_msg)
+    return midi_msg
+
+def update_note(state: State, midiout, note, velocity):
+    """Send a note_on to the controller, unless it already shows this velocity.
+
+    Returns the sent (raw) message, or None if it was skipped.
+    """
+    last_sent = state.last_sent_note
+    if last_sent.get(note) == velocity:
+        return None
+    last_sent[note] = velocity
+    return send_note_on(midiout, note, velocity)
 
-    layer = configuration['layers'][CURRENT_LAYER]
+def update_cc(state: State, midiout, control, value):
+    """Send a control_change to the controller, unless it already shows this value.
 
-    buttons = layer['buttons'].get(confuse.Sequence(confuse.Optional(str)))
-    encoders = layer['encoders'].get(confuse.Sequence(confuse.Optional(str)))
-    mutegroups = layer['mutegroups'].get(confuse.Sequence(confuse.Optional(str)))
+    Returns the sent (raw) message, or None if it was skipped.
+    """
+    last_sent = state.last_sent_cc
+    if last_sent.get(control) == value:
+        return None
+    last_sent[control] = value
+    return send_cc(midiout, control, value)
+
+def flush_midi(state: State, midiout, notes, controls):
+    """Bring the controller to the given note velocities and control values in one batch.
+
+    Only entries that differ from what was last sent are written.
+    """
+    last_sent_note = state.last_sent_note
+    last_sent_cc = state.last_sent_cc
+    batch = []
+    for note, velocity in notes.items():
+        if last_sent_note.get(note) != velocity:
+            last_sent_note[note] = velocity
+            batch.append((NOTE_ON, note, velocity))
+    for control, value in controls.items():
+        if last_sent_cc.get(control) != value:
+            last_sent_cc[control] = value
+            batch.append((CONTROL_CHANGE, control, value))
+
+    logger.debug("Flushing %d MIDI messages", len(batch))
+    send_batch(midiout, batch)
+
+def midi_for_osc(address, value, layer: LayerState):
+    """Return the (kind, note/control, velocity/value) showing an OSC value, or None if unmapped."""
+    hit = layer.address_map.get(address)
+    if hit is None:
+        return None
 
-    if address in buttons:
-        ix = buttons.index(address)
-        note = BUTTON_IXES[ix]
+    kind, output = hit
+    if kind == BUTTON:
+        return kind, output, 127 if (value >= 0.5) ^ layer.invert_buttons else 0
 
-        try:
-            if layer['invert_buttons'].get(bool):
-                value = not value
-        except confuse.NotFoundError:
-            pass
-
-        velocity = 127 if value else 0
-        midi_msg = mido.Message('note_on', channel=0, note=note, velocity=velocity)
-        logging.debug(f"OSC to MIDI: {address}={value} -> {midi_msg}")
-        midiout.send(midi_msg)
-    
-    if address in encoders:
-        ix = encoders.index(address)
-
-        try:
-            style_name = layer['encoder_style'].get(str)
-            base, span = ENCODER_STYLES[style_name]
-        except confuse.NotFoundError:
-            base, span = ENCODER_STYLES['single']
-        except KeyError:
-            base, span = ENCODER_STYLES['single']
-            logging.warning(f"Unknown encoder style: {style_name}")
+    base, span = layer.encoder_base, layer.encoder_span
+    return kind, output, base + max(0, min(span, round(value * span)))
 
-        control = 48 + ix
+def update_mutegroups(state: State, address, value, layer: LayerState):
+    for idx in layer.mutegroup_ixes.get(address, ()):
+        state.mutegroup_buttons[idx] = value
 
-        new_value = base + max(0, min(span, round(value * span)))
+def osc_to_midi(state: State, address, value, midiout):
+    layer = state.layers[state.current_layer]
 
-        midi_msg = mido.Message('control_change', channel=0, control=control, value=new_value)
-        logging.debug(f"OSC to MIDI: {address}={value} -> {midi_msg}")
-        midiout.send(midi_msg)
+    update_mutegroups(state, address, value, layer)
 
-    for idx, mutegroup in enumerate(mutegroups):
-        if address == mutegroup:
-            MUTEGROUP_BUTTONS[idx] = value
+    target = midi_for_osc(address, value, layer)
+    if target is None:
+        return
 
+    kind, output, midi_value = target
+    if kind == BUTTON:
+        midi_msg = update_note(state, midiout, output, midi_value)
+    else:
+        midi_msg = update_cc(state, midiout, output, midi_value)
 
-async def handle_meters(message, configuration, midiout):
-    global CURRENT_LAYER, METER_CACHE
+    if midi_msg and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("OSC to MIDI: %s=%s -> %s", address, value, midi_msg)
 
-    current_layer = CURRENT_LAYER
 
-    current_meters = configuration['layers'][current_layer]['meters'].get(confuse.Sequence(confuse.Optional(int)))
-    try:
-        threshold = configuration['meter_threshold'].get(float)
-    except confuse.NotFoundError:
-        threshold = 0.5
+async def handle_meters(state: State, message, midiout):
+    levels = message.arguments
+    threshold = state.meter_raw_threshold
 
-    meter_values = []
-    for idx, target in enumerate(current_meters):
+    for target, note in state.layers[state.current_layer].meter_notes:
         try:
-            if target is not None:
-                value = message.arguments[target]
-                value = value / 32768.0 + 1
-                meter_values.append(value)
-
-                light_up = value >= threshold
-                
-                if target in METER_CACHE:
-                    if METER_CACHE[target] == light_up:
-                        continue
-                
-                button_index = BUTTON_IXES[ idx + 8 ]
-                midi_msg = mido.Message('note_on', channel=0, note=button_index, velocity=127 if light_up else 0)
-                logging.debug(f"Meter MIDI: meter={target} value={value} -> {midi_msg}")
-                midiout.send(midi_msg)
-
-                METER_CACHE[target] = light_up
-            else:
-                meter_values.append(0)
+            value = levels[target]
+            midi_msg = update_note(state, midiout, note, 127 if value >= threshold else 0)
+            if midi_msg and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Meter MIDI: meter=%s value=%s -> %s", target, value / 32768.0 + 1, midi_msg)
         except Exception as exc:
-            logging.error(f"Failed to handle meter {target}: {exc}")
+            logger.error("Failed to handle meter %s: %s", target, exc)
 
-    # logging.debug(f"Meter values: {meter_values}")
-
-async def periodic_mutegroup_blink(configuration, midiout):
+async def periodic_mutegroup_blink(state: State, midiout):
     blinkomatic = False
 
     while True:
         try:
-            layer_config = configuration['layers'][CURRENT_LAYER]
-            buttons = layer_config['buttons'].get(confuse.Sequence(confuse.Optional(str)))
-            mutegroups = layer_config['mutegroups'].get(confuse.Sequence(confuse.Optional(str)))
-
-            for i in range(8):
-                if len(buttons) > i and buttons[i]:
-                    current_mute = not OSC_CACHE.get(buttons[i], 1)
-                    if current_mute:
+            buttons = state.layers[state.current_layer].buttons
+            # Rebound on every layer switch, so only looked up once per cycle
+            mutegroup_buttons = state.mutegroup_buttons
+            current_state = state.current_layer_state
+
+            for i, note in enumerate(BUTTON_IXES[:8]):
+                address = buttons[i] if i < len(buttons) else None
+                if address:
+                    current = current_state.get(address)
+                    if current is not None and not current:
                         # There is no touching
                         continue
-                
-                button_index = BUTTON_IXES[i]
 
-                if blinkomatic:
-                    if i in MUTEGROUP_BUTTONS and MUTEGROUP_BUTTONS[i]:
-                        midi_msg = mido.Message('note_on', channel=0, note=button_index, velocity=127)
-                        midiout.send(midi_msg)
+                if not blinkomatic:
+                    velocity = 0
+                elif mutegroup_buttons.get(i):
+                    velocity = 127
                 else:
-                    button_index = BUTTON_IXES[i]
-                    midi_msg = mido.Message('note_on', channel=0, note=button_index, velocity=0)
-                    midiout.send(midi_msg)
+                    continue
+
+                # Only sent when the LED does not show this already
+                update_note(state, midiout, note, velocity)
 
             blinkomatic = not blinkomatic
 
-            await asyncio.sleep(0.243)
+            if any(mutegroup_buttons.values()):
+                await asyncio.sleep(MUTEGROUP_BLINK_INTERVAL)
+            else:
+                # Nothing blinks, only keep an eye out for mute groups turning on
+                await asyncio.sleep(MUTEGROUP_IDLE_INTERVAL)
         except Exception as exc:
-            logging.warning(f"Failed to process mutegroup blink: {exc}")
+            logger.warning("Failed to process mutegroup blink: %s", exc)
                 
 
-async def clear_midi(midiout):
-    global METER_CACHE, MUTEGROUP_BUTTONS
-
-    METER_CACHE = {}
-    MUTEGROUP_BUTTONS = {}
+async def clear_midi(state: State, notes, controls):
+    """Reset the per-layer MIDI state, stashing an all-off controller into `notes`/`controls`."""
+    state.mutegroup_buttons = {}
 
     for ix in BUTTON_IXES:
-        midi_msg = mido.Message('note_on', channel=0, note=ix, velocity=0)
-        midiout.send(midi_msg)
-    for encoder in range(8):
-        control = 48 + encoder
-        midi_msg = mido.Message('control_change', channel=0, control=control, value=0)
-        midiout.send(midi_msg)
+        notes[ix] = 0
+    for control in ENCODER_RING_CONTROLS:
+        controls[control] = 0
 
-async def refresh_layer_with_cache(configuration, midiout):
-    global OSC_CACHE
+async def refresh_layer_with_cache(state: State, midiout):
+    notes = {}
+    controls = {}
 
-    await clear_midi(midiout)
+    await clear_midi(state, notes, controls)
     logging.info("Refreshing values to MIDI")
 
-    for key, value in OSC_CACHE.items():
-        osc_to_midi(key, value, configuration, midiout)
+    for ix, note in enumerate(LAYER_BUTTONS):
+        notes[note] = 127 if ix == state.current_layer else 0
 
-async def switch_layer(new_layer, configuration, midiout):
-    global CURRENT_LAYER
+    layer = state.layers[state.current_layer]
+    for key, value in state.current_layer_state.items():
+        if value is None:
+            continue
 
-    CURRENT_LAYER = new_layer
-    logging.info(f"Switching to layer {CURRENT_LAYER}")
+        update_mutegroups(state, key, value, layer)
 
-    for ix, button in enumerate(LAYER_BUTTONS):
-        note = button
-        velocity = 127 if ix == CURRENT_LAYER else 0
-        midi_msg = mido.Message('note_on', channel=0, note=note, velocity=velocity)
-        logging.debug(f"Layer button MIDI: layer={CURRENT_LAYER} -> {midi_msg}")
-        midiout.send(midi_msg)
+        target = midi_for_osc(key, value, layer)
+        if target is not None:
+            kind, output, midi_value = target
+            (notes if kind == BUTTON else controls)[output] = midi_value
 
-    await refresh_layer_with_cache(configuration, midiout)
+    flush_midi(state, midiout, notes, controls)
+
+async def switch_layer(state: State, new_layer, midiout):
+    state.current_layer = new_layer
+    logging.info(f"Switching to layer {state.current_layer}")
+
+    # Keep the values of the layer we leave, then load the new layer's ones
+    current_state = state.current_layer_state
+    osc_cache = state.osc_cache
+    osc_cache.update((key, value) for key, value in current_state.items() if value is not None)
+    current_state.clear()
+    layer = state.layers[state.current_layer]
+    for key in layer.encoders + layer.buttons + layer.mutegroups:
+        if key:
+            current_state[key] = osc_cache.get(key)
+
+    await refresh_layer_with_cache(state, midiout)
 
 def load_config(path: Path):
     cfg = confuse.Configuration('event-depot', __name__)
@@ -476,7 +708,7 @@ def load_config(path: Path):
 async def midi_keepalive(outputport):
     while True:
         # Periodic send message to MIDI to check disconnects
-        outputport.send(mido.Message('note_on', note=0, velocity=0))
+        send_note_on(outputport, 0, 0)
         await asyncio.sleep(1)
 
 def critical_error_callback(type, error, data):
@@ -505,7 +737,7 @@ def search_midi_device(name: str | None, is_output: bool) -> str | None:
             return dev
 
     logging.warning(f'No MIDI device matched "{name}" (direction={"output" if is_output else "input"}).')
-    logging.debug(f'Available MIDI devices: {devices}')
+    logger.debug('Available MIDI devices: %s', devices)
 
     return None
 
@@ -526,7 +758,6 @@ async def main(argv=None):
         level = logging.INFO
 
     coloredlogs.install(level=level, fmt='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
-    logger = logging.getLogger('midi')
 
     if args.list:
         logger.info("Listing MIDI devices")
@@ -540,6 +771,12 @@ async def main(argv=None):
 
     cfg = load_config(args.config)
 
+    state = State(
+        layers=build_layer_states(cfg),
+        big_fader=cfg['big_fader'].get(confuse.Optional(str)),
+        meter_raw_threshold=raw_meter_threshold(_get_optional(cfg['meter_threshold'], float, METER_THRESHOLD)),
+    )
+
     input_name = args.input_name or cfg['midi']['input'].get()
     output_name = args.output_name or cfg['midi']['output'].get()
 
@@ -551,18 +788,20 @@ async def main(argv=None):
         status = await xair.get("/status")
         logger.info(f"X-Air status: {status}")
 
-        cb, stream = make_stream()
+        loop = asyncio.get_running_loop()
+        midi_queue = asyncio.Queue(maxsize=MIDI_QUEUE_SIZE)
+        cb = make_midi_callback(loop, midi_queue)
 
         try:
             logging.info(f"Opening input  '{input_name}'")
-            midiin = mido.open_input(input_name, callback=cb)
+            midiin = mido.open_input(input_name)
         except (IOError, OSError) as exc:
             logging.warning(f"Failed to open MIDI input '{input_name}': {exc}")
 
             alt = search_midi_device(input_name, is_output=False)
             if alt:
                 try:
-                    midiin = mido.open_input(alt, callback=cb)
+                    midiin = mido.open_input(alt)
                 except (IOError, OSError) as exc2:
                     logging.error(f"Fallback failed to open MIDI input '{alt}': {exc2}")
                     return 3
@@ -587,32 +826,29 @@ async def main(argv=None):
                 logging.error(f"Could not identify any MIDI output device matching '{output_name}'.")
                 return 3
 
+        midiin._rt.set_callback(cb)
         midiin._rt.set_error_callback(critical_error_callback)
         midiout._rt.set_error_callback(critical_error_callback)
 
-        xair.enable_meter(1)
+        xair.enable_meter(METER_ID)
 
         xair_task = xair.start()
 
-        await create_osc_cache(cfg, xair)
+        await create_osc_cache(state, xair)
 
-        await switch_layer(0, cfg, midiout)
+        await switch_layer(state, 0, midiout)
 
-        osc_task = asyncio.create_task(osc_handler(cfg, xair, midiout))
+        osc_task = asyncio.create_task(osc_handler(state, xair, midiout))
 
-        midi_queue = asyncio.Queue()
-        midi_input_task = asyncio.create_task(monitor_midi(stream, midi_queue))
-        midi_handle_task = asyncio.create_task(midi_event_handler(cfg, xair, midiout, midi_queue))
+        midi_handle_task = asyncio.create_task(midi_event_handler(state, xair, midiout, midi_queue))
 
-        mutegroup_blinkomatic_task = asyncio.create_task(periodic_mutegroup_blink(cfg, midiout))
+        mutegroup_blinkomatic_task = asyncio.create_task(periodic_mutegroup_blink(state, midiout))
 
         await asyncio.gather(
-            midi_input_task,
             midi_handle_task,
             xair_task,
             osc_task,
             mutegroup_blinkomatic_task,
-            # midi_task,
             midi_keepalive(midiout)
         )
     except KeyboardInterrupt:
@@ -8,26 +8,132 @@ from __future__ import annotations
 
 import argparse
 import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 import sys
 import re
+import threading
 import pywinctl as pwc
-import nltk
 import time
 from flask import Flask, app, request, jsonify, make_response
 
 # Maximum length (in characters) to compare when matching parts of titles/authors
 MAX_COMPARE_LENGTH = 10
 
+# Separators between the artist, title, player name etc. in window titles
+TITLE_SPLIT_RE = re.compile(r'\s*[-|—]\s*')
+
+# Prefix some players add to the window title while playing
+PLAYING_PREFIX = "▶︎"
+
+# Lowercase tag keys holding each field, by order of preference
+AUTHOR_TAG_KEYS = ('artist', 'tpe1', '©art', 'author')
+TITLE_TAG_KEYS = ('title', 'tit2', '©nam')
+# purl/license may be stored in TXXX frames or custom tags
+PURL_TAG_KEYS = ('purl', 'purl:uri', 'website', 'txxx:purl', 'txxx:website', 'woaf', 'wors', 'woas', 'wpub')
+LICENSE_TAG_KEYS = ('license', 'licenseurl', 'copyright', 'txxx:license', 'txxx:licenseurl', 'tcop', 'wcop')
+
+# Time (in seconds) during which the list of window titles is reused
+TITLES_MAX_AGE = 0.5
+
+# Number of threads computing edit distances in batch (-1: one per CPU). A lookup is a
+# few thousand distances at most, which takes less time than starting extra threads.
+MATCH_WORKERS = 1
+
+# Number of threads reading music file tags while indexing
+INDEX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
 try:
     import coloredlogs
 except Exception:
     coloredlogs = None
 
-from mutagen import File as MutagenFile
+try:
+    # Production WSGI server, which unlike gunicorn also runs on Windows
+    import waitress
+except ImportError:
+    waitress = None
+
+try:
+    # C++ bit-parallel Levenshtein, batched over all pairs by cdist (which needs numpy)
+    import numpy as np
+    from rapidfuzz import process
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+try:
+    # Rust drop-in for mutagen with the same API, much faster at parsing tags
+    from mutagen_rs import File as MutagenFile
+except ImportError:
+    try:
+        from mutagen import File as MutagenFile
+    except ImportError:
+        MutagenFile = None
 
 _LOG = logging.getLogger("winmusic")
 
+# (time.monotonic() of the enumeration, window titles)
+_titles_cache: tuple[float, tuple[str, ...]] | None = None
+# The HTTP server calls window_titles() from several threads
+_titles_lock = threading.Lock()
+
+
+if Levenshtein is not None:
+    def edit_distance(a: str, b: str, cutoff: int | None = None) -> int:
+        """Levenshtein distance between `a` and `b`.
+
+        Distances above `cutoff` are not computed exactly: `cutoff + 1` is returned instead.
+        """
+        return Levenshtein.distance(a, b, score_cutoff=cutoff)
+else:
+    def edit_distance(a: str, b: str, cutoff: int | None = None) -> int:
+        """Levenshtein distance between `a` and `b`, using Myers' bit-parallel algorithm.
+
+        Compared keys are at most MAX_COMPARE_LENGTH long, so a whole column of the
+        DP matrix fits in one int. Distances above `cutoff` are not computed exactly:
+        `cutoff + 1` is returned instead.
+        """
+        if not a or not b:
+            distance = len(a) + len(b)
+            return distance if cutoff is None or distance <= cutoff else cutoff + 1
+
+        # Bitmask of the positions of each character in `a`
+        peq: dict[str, int] = {}
+        for i, c in enumerate(a):
+            peq[c] = peq.get(c, 0) | (1 << i)
+
+        full = (1 << len(a)) - 1
+        last = 1 << (len(a) - 1)
+        pv, mv = full, 0
+        distance = len(a)
+        remaining = len(b)
+
+        for c in b:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if ph & last:
+                distance += 1
+            elif mh & last:
+                distance -= 1
+            ph = (ph << 1) | 1
+            mh <<= 1
+            pv = (mh | ~(xv | ph)) & full
+            mv = ph & xv
+
+            # Each remaining character can lower the distance by at most one
+            remaining -= 1
+            if cutoff is not None and distance - remaining > cutoff:
+                return cutoff + 1
+
+        return distance
+
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     """Parse command-line arguments for winmusic.
@@ -50,6 +156,14 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
                         default=7372,
                         help="Bind port for HTTP server (default: 7372)")
 
+    parser.add_argument("-t", "--threads", dest="threads", type=int,
+                        default=4,
+                        help="Number of threads serving HTTP requests (default: 4)")
+
+    parser.add_argument("-w", "--match-workers", dest="match_workers", type=int,
+                        default=MATCH_WORKERS,
+                        help=f"Threads computing edit distances per lookup, -1 for one per CPU (default: {MATCH_WORKERS})")
+
     parser.add_argument("-l", "--lev", dest="lev", type=float,
                         default=3.0,
                         help="Levenshtein threshold, default 3")
@@ -69,6 +183,12 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     if ns.port <= 0 or ns.port > 65535:
         parser.error("--port must be a valid TCP port (1-65535)")
 
+    if ns.threads <= 0:
+        parser.error("--threads must be positive")
+
+    if ns.match_workers == 0 or ns.match_workers < -1:
+        parser.error("--match-workers must be positive or -1")
+
     return ns
 
 
@@ -90,116 +210,300 @@ def setup_logging(debug: bool = False, quiet: bool = False) -> None:
     else:
         logging.basicConfig(level=level, format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s")
 
-def create_music_database(music_dir: Path) -> None:
-    """Scan `music_dir` recursively and build a simple metadata database.
+def compare_key(value: str | None) -> str:
+    """Normalize an author/title into the form compared by `identify`."""
+    return (value or '').strip()[:MAX_COMPARE_LENGTH].lower().strip()
 
-    Returns a dict mapping file path (str) -> metadata dict with keys:
-      - author
-      - title
-      - purl
-      - license
+def trigrams(key: str) -> set[str]:
+    return {key[i:i + 3] for i in range(len(key) - 2)}
 
-    This function will try to use mutagen when available to read tags.
-    If mutagen is not present or tags are missing, it will attempt to
-    infer author/title from the filename ("Artist - Title.ext").
+def build_trigram_index(keys: list[str]) -> dict[str, list[int]]:
+    """Map each trigram to the indices of the `keys` containing it."""
+    index: dict[str, list[int]] = {}
+    for ix, key in enumerate(keys):
+        for gram in trigrams(key):
+            index.setdefault(gram, []).append(ix)
+    return index
+
+def trigram_index_useful(cutoff: int) -> bool:
+    """Whether a trigram index can rule out any key when matching within `cutoff` edits.
+
+    Keys have at most MAX_COMPARE_LENGTH - 2 trigrams, and each edit may destroy 3 of
+    them, so larger cutoffs (such as the default of 3) never prune anything.
     """
-    db: dict[str, dict] = {}
+    return MAX_COMPARE_LENGTH - 2 > 3 * cutoff
 
-    for p in sorted(music_dir.rglob('*')):
-        if not p.is_file():
+def trigram_candidates(index: dict[str, list[int]], parts: list[str], cutoff: int) -> set[int] | None:
+    """Indices of the keys that may be within `cutoff` edits of any of `parts`.
+
+    Returns None when the index cannot rule out any key, e.g. for short parts.
+    """
+    candidates = set()
+    for part in parts:
+        grams = trigrams(part)
+        # A single edit destroys at most 3 of the part's trigrams, so any key within
+        # `cutoff` edits must still contain this many of them
+        required = len(grams) - 3 * cutoff
+        if required < 1:
+            return None
+
+        counts = Counter()
+        for gram in grams:
+            counts.update(index.get(gram, ()))
+        candidates.update(ix for ix, count in counts.items() if count >= required)
+    return candidates
+
+
+@dataclass
+class MusicDB:
+    """Indexed songs, stored as parallel lists (row `ix` of each one is the same song).
+
+    Matching only touches the compact key lists and their trigram indices, the
+    metadata dicts are only read for the song that matched.
+    """
+    songs: list[dict]
+    # compare_key() of each song's author/title
+    author_keys: list[str]
+    title_keys: list[str]
+    # None when the cutoff is too large for trigrams to rule anything out
+    author_trigrams: dict[str, list[int]] | None
+    title_trigrams: dict[str, list[int]] | None
+
+    def candidates(self, parts: list[str], cutoff: int):
+        """Indices of the songs that may match `parts` within `cutoff` edits, in order."""
+        if self.author_trigrams is None or self.title_trigrams is None or not trigram_index_useful(cutoff):
+            return range(len(self.songs))
+
+        authors = trigram_candidates(self.author_trigrams, parts, cutoff)
+        titles = trigram_candidates(self.title_trigrams, parts, cutoff)
+
+        if authors is None and titles is None:
+            return range(len(self.songs))
+        if authors is None:
+            return sorted(titles)
+        if titles is None:
+            return sorted(authors)
+        # Both the author and the title need to match
+        return sorted(authors & titles)
+
+
+if Levenshtein is not None:
+    def find_match(music_db: MusicDB, parts: list[str], candidates, cutoff: int) -> tuple[int | None, int]:
+        """Find the first of the `candidates` songs whose author and title are both within
+        `cutoff` edits of one of `parts`.
+
+        Returns its index (or None), and the number of distances computed. All of them
+        are computed by two cdist calls: one for all the authors, then one for the titles
+        of the songs whose author matched.
+        """
+        if isinstance(candidates, range):
+            authors, titles = music_db.author_keys, music_db.title_keys
+        else:
+            authors = [music_db.author_keys[ix] for ix in candidates]
+            titles = [music_db.title_keys[ix] for ix in candidates]
+        if not authors:
+            return None, 0
+
+        author_distances = process.cdist(parts, authors, scorer=Levenshtein.distance, score_cutoff=cutoff, workers=MATCH_WORKERS)
+        author_hits = np.flatnonzero(author_distances.min(axis=0) <= cutoff)
+        tested = len(parts) * len(authors)
+        if len(author_hits) == 0:
+            return None, tested
+
+        title_distances = process.cdist(parts, [titles[ix] for ix in author_hits], scorer=Levenshtein.distance, score_cutoff=cutoff, workers=MATCH_WORKERS)
+        title_ok = title_distances.min(axis=0) <= cutoff
+        tested += len(parts) * len(author_hits)
+
+        first = int(np.argmax(title_ok))
+        if not title_ok[first]:
+            return None, tested
+        return candidates[int(author_hits[first])], tested
+else:
+    def find_match(music_db: MusicDB, parts: list[str], candidates, cutoff: int) -> tuple[int | None, int]:
+        """Find the first of the `candidates` songs whose author and title are both within
+        `cutoff` edits of one of `parts`.
+
+        Returns its index (or None), and the number of distances computed.
+        """
+        tested = 0
+        part_lengths = [(part, len(part)) for part in parts]
+        for ix in candidates:
+            for keys in (music_db.author_keys, music_db.title_keys):
+                key = keys[ix]
+                key_length = len(key)
+                for part, part_length in part_lengths:
+                    # The length difference alone takes this many edits
+                    if abs(part_length - key_length) > cutoff:
+                        continue
+                    tested += 1
+                    if edit_distance(part, key, cutoff) <= cutoff:
+                        break
+                else:
+                    # Neither part matches this field
+                    break
+            else:
+                return ix, tested
+        return None, tested
+
+
+def iter_files(root: str):
+    """Yield the paths of all files under `root`, recursively.
+
+    Unlike Path.rglob, the file type comes from the directory listing itself, so
+    most entries need no extra stat() call.
+    """
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from iter_files(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+    except OSError as exc:
+        _LOG.debug(f'Cannot list {root}: {exc}')
+
+def first_tag(tags, names: dict[str, object], keys: tuple[str, ...]) -> str | None:
+    """Return the value of the first of `keys` that is set in `tags`, or None.
+
+    `names` maps lowercase key names to the actual keys of `tags`.
+    """
+    for key in keys:
+        name = names.get(key)
+        if name is None:
+            continue
+        try:
+            value = tags[name]
+        except Exception:
             continue
+        if value:
+            return str(value[0]) if isinstance(value, (list, tuple)) else str(value)
+    return None
+
+def read_metadata(p: str) -> dict | None:
+    """Read the metadata of a single music file, or None if it has no tags."""
+    meta = {'author': None, 'title': None, 'purl': None, 'license': None, 'path': p}
+
+    if MutagenFile is not None:
+        try:
+            f = MutagenFile(p)
+            tags = getattr(f, 'tags', None)
 
-        meta = {'author': None, 'title': None, 'purl': None, 'license': None, 'path': str(p)}
+            if not tags:
+                return None
 
-        if MutagenFile is not None:
+            # normalize tag keys to lowercase strings for lookup, values are only read
+            # for the keys we look for
             try:
-                f = MutagenFile(str(p))
-                tags = getattr(f, 'tags', None)
-
-                if not tags:
-                    continue
-
-                # normalize tag keys to lowercase strings for lookup
-                try:
-                    items = {k.lower(): tags[k] for k in tags.keys()}
-                except Exception:
-                    # fallback for tag types that don't support keys()
-                    items = {}
-                    for k in tags:
-                        try:
-                            items[str(k).lower()] = tags[k]
-                        except Exception:
-                            pass
-
-                # common artist/title keys
-                for key in ('artist', 'tpe1', '©art', '©art', '©nam', 'author'):
-                    if key in items and items[key]:
-                        meta['author'] = str(items[key][0]) if isinstance(items[key], (list, tuple)) else str(items[key])
-                        break
+                names = {k.lower(): k for k in tags.keys()}
+            except Exception:
+                # fallback for tag types that don't support keys()
+                names = {str(k).lower(): k for k in tags}
 
-                for key in ('title', 'tit2', '©nam'):
-                    if key in items and items[key]:
-                        meta['title'] = str(items[key][0]) if isinstance(items[key], (list, tuple)) else str(items[key])
-                        break
+            meta['author'] = first_tag(tags, names, AUTHOR_TAG_KEYS)
+            meta['title'] = first_tag(tags, names, TITLE_TAG_KEYS)
+            meta['purl'] = first_tag(tags, names, PURL_TAG_KEYS)
+            meta['license'] = first_tag(tags, names, LICENSE_TAG_KEYS)
 
-                # purl/license may be stored in TXXX frames or custom tags
-                for key in ('purl', 'purl:uri', 'website', 'txxx:purl', 'txxx:website', 'woaf', 'wors', 'woas', 'wpub'):
-                    if key in items and items[key]:
-                        meta['purl'] = str(items[key][0]) if isinstance(items[key], (list, tuple)) else str(items[key])
-                        break
+        except Exception:
+            _LOG.debug(f'Mutagen failed to read tags for {p}', exc_info=False)
 
-                for key in ('license', 'licenseurl', 'copyright', 'txxx:license', 'txxx:licenseurl', 'tcop', 'wcop'):
-                    if key in items and items[key]:
-                        meta['license'] = str(items[key][0]) if isinstance(items[key], (list, tuple)) else str(items[key])
-                        break
+    return meta
 
-            except Exception:
-                _LOG.debug(f'Mutagen failed to read tags for {p}', exc_info=False)
+def create_music_database(music_dir: Path, cutoff: int) -> MusicDB:
+    """Scan `music_dir` recursively and build a simple metadata database.
 
-        db[str(p)] = meta
+    Returns a MusicDB whose songs are metadata dicts with keys:
+      - author
+      - title
+      - purl
+      - license
+      - path
 
-    _LOG.info(f'Indexed {len(db)} files under {music_dir}')
-    
-    # import json
-    # print(json.dumps(db, indent=2))
+    This function will try to use mutagen when available to read tags.
+    If mutagen is not present or tags are missing, it will attempt to
+    infer author/title from the filename ("Artist - Title.ext").
 
-    return db
+    The trigram indices are only built when they can speed up matching within
+    `cutoff` edits.
+    """
+    # Reading tags is mostly waiting on I/O, so overlap it (especially on network shares)
+    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as executor:
+        songs = [meta for meta in executor.map(read_metadata, iter_files(str(music_dir))) if meta is not None]
 
-def identify(music_db: dict[str, dict], threshold) -> dict:
-    titles = pwc.getAllTitles()
+    _LOG.info(f'Indexed {len(songs)} files under {music_dir}')
+    
+    # import json
+    # print(json.dumps(songs, indent=2))
+
+    # Keys used for matching, computed once instead of on every identify(). An empty key is
+    # within the cutoff of any short window title part, so songs missing either tag can't be
+    # told apart from anything else and are left out.
+    keyed = [(meta, compare_key(meta['author']), compare_key(meta['title'])) for meta in songs]
+    keyed = [entry for entry in keyed if entry[1] and entry[2]]
+    if len(keyed) < len(songs):
+        _LOG.info(f'Skipping {len(songs) - len(keyed)} files without both an author and a title')
+    songs = [meta for meta, _, _ in keyed]
+    author_keys = [author for _, author, _ in keyed]
+    title_keys = [title for _, _, title in keyed]
+    use_trigrams = trigram_index_useful(cutoff)
+    return MusicDB(
+        songs=songs,
+        author_keys=author_keys,
+        title_keys=title_keys,
+        author_trigrams=build_trigram_index(author_keys) if use_trigrams else None,
+        title_trigrams=build_trigram_index(title_keys) if use_trigrams else None,
+    )
+
+def window_titles() -> tuple[str, ...]:
+    """Titles of all windows, enumerated at most once every TITLES_MAX_AGE seconds."""
+    global _titles_cache
+
+    with _titles_lock:
+        now = time.monotonic()
+        if _titles_cache is None or now - _titles_cache[0] > TITLES_MAX_AGE:
+            _titles_cache = (now, tuple(pwc.getAllTitles()))
+        return _titles_cache[1]
+
+def identify(music_db: MusicDB, titles: list[str], threshold) -> dict:
+    """Find the song of `music_db` named by one of the window `titles`, or None."""
     _LOG.debug(f"Current window titles: {titles}")
 
+    # Anything further than the threshold is a miss, no need for the exact distance
+    cutoff = int(threshold)
+
     # Fun statistics
     combinations_tested = 0
     start_time = time.time()
 
+    # Parts already searched for without a match, e.g. from several tabs of the same page
+    tried: set[tuple[str, ...]] = set()
+
     for title in titles:
         # Try to split title based on - or |
-        title = title.replace("▶︎", "").strip()
-        parts = re.split(r'\s*[-|—]\s*', title)
+        title = title.replace(PLAYING_PREFIX, "").strip()
+        parts = TITLE_SPLIT_RE.split(title)
         if len(parts) < 2:
             continue
-        print(parts)
-
-        # Linear search all songs for match
-        for song_path, meta in music_db.items():
-            required = [ meta.get('author').strip()[:MAX_COMPARE_LENGTH].lower().strip(), meta.get('title').strip()[:MAX_COMPARE_LENGTH].lower().strip() ]
-
-            # Match between parts and candidates
-            success_required = 0
-            for metadatum in required:
-                for part in parts:
-                    part_clean = part.strip().lower()[:MAX_COMPARE_LENGTH].strip()
-                    combinations_tested += 1
-                    if nltk.edit_distance(part_clean, metadatum) <= threshold:
-                        success_required += 1
-                        break
-            if success_required == len(required):
-                _LOG.debug(f"Edit distance between '{part_clean}' and '{metadatum}' is {nltk.edit_distance(part_clean, metadatum)} < {threshold}")
-                _LOG.debug(f"Total combinations tested so far: {combinations_tested}. Time elapsed: {1000.0 * (time.time() - start_time):.0f} ms")
-                _LOG.info(f"Match found! Window title: [{title}] Song: [{meta.get('author')}] [{meta.get('title')}]")
-                _LOG.debug(f"Matched song metadata: {meta}")
-                return meta
+        _LOG.debug(f"Window title parts: {parts}")
+
+        parts_clean = [part.strip().lower()[:MAX_COMPARE_LENGTH].strip() for part in parts]
+
+        key = tuple(parts_clean)
+        if key in tried:
+            continue
+        tried.add(key)
+
+        # Only the songs that are not ruled out by the trigram index are compared
+        ix, tested = find_match(music_db, parts_clean, music_db.candidates(parts_clean, cutoff), cutoff)
+        combinations_tested += tested
+
+        if ix is not None:
+            meta = music_db.songs[ix]
+            _LOG.debug(f"Parts {parts_clean} are within {threshold} edits of '{music_db.author_keys[ix]}' and '{music_db.title_keys[ix]}'")
+            _LOG.debug(f"Total combinations tested so far: {combinations_tested}. Time elapsed: {1000.0 * (time.time() - start_time):.0f} ms")
+            _LOG.info(f"Match found! Window title: [{title}] Song: [{meta.get('author')}] [{meta.get('title')}]")
+            _LOG.debug(f"Matched song metadata: {meta}")
+            return dict(meta)
 
     _LOG.info(f"No match found :( Total combinations tested: {combinations_tested} in {1000.0 * (time.time() - start_time):.0f} ms")
 
@@ -207,7 +511,10 @@ def identify(music_db: dict[str, dict], threshold) -> dict:
 
 
 def main(argv: list[str] | None = None) -> int:
+    global MATCH_WORKERS
+
     ns = parse_args(argv)
+    MATCH_WORKERS = ns.match_workers
     setup_logging(ns.debug, ns.quiet)
 
     _LOG.info(f"Starting winmusic with: music_dir={ns.music_dir} interval={ns.interval} host={ns.host} port={ns.port} lev={ns.lev}")
@@ -222,11 +529,11 @@ def main(argv: list[str] | None = None) -> int:
         return 2
     
     _LOG.debug(f"Indexing music files in {ns.music_dir}...")
-    music_db = create_music_database(ns.music_dir)
+    music_db = create_music_database(ns.music_dir, int(ns.lev))
 
     if ns.no_server:
         _LOG.info("Running single identification pass (no server mode)...")
-        result = identify(music_db, ns.lev)
+        result = identify(music_db, pwc.getAllTitles(), ns.lev)
         if result is None:
             _LOG.error("No match found.")
             return 1
@@ -238,6 +545,38 @@ def main(argv: list[str] | None = None) -> int:
             print(f"Path: {result.get('path')}")
             return 0
 
+    # identify() only depends on the window titles, so its results are reused for the
+    # same titles until they are older than the check interval
+    identify_cache: dict[tuple[str, ...], tuple[float, dict | None]] = {}
+    # waitress serves requests from several threads. identify() itself runs outside the lock.
+    identify_lock = threading.Lock()
+
+    def cached_identify() -> dict | None:
+        titles = window_titles()
+        now = time.monotonic()
+
+        with identify_lock:
+            hit = identify_cache.get(titles)
+        if hit is not None and now - hit[0] < ns.interval:
+            return hit[1]
+
+        result = identify(music_db, titles, ns.lev)
+
+        now = time.monotonic()
+        with identify_lock:
+            for key in [key for key, (ts, _) in identify_cache.items() if now - ts >= ns.interval]:
+                del identify_cache[key]
+            identify_cache[titles] = (now, result)
+
+        return result
+
+    # Warm up pywinctl and the matching code (and the cache) so that the first
+    # request does not pay for it
+    try:
+        cached_identify()
+    except Exception:
+        _LOG.warning('Warm-up identification failed', exc_info=True)
+
     # Create a minimal Flask app that exposes a POST /identify endpoint
     app = Flask(__name__)
 
@@ -253,7 +592,7 @@ def main(argv: list[str] | None = None) -> int:
             return resp
 
         try:
-            result = identify(music_db, ns.lev)
+            result = cached_identify()
             if result is None:
                 resp = jsonify({})
                 resp.status_code = 404
@@ -271,7 +610,11 @@ def main(argv: list[str] | None = None) -> int:
 
     try:
         _LOG.info(f'Starting HTTP identify server on {ns.host}:{ns.port}')
-        app.run(host=ns.host, port=ns.port)
+        if waitress is not None:
+            waitress.serve(app, host=ns.host, port=ns.port, threads=ns.threads)
+        else:
+            _LOG.warning('waitress is not installed, falling back to the Flask development server')
+            app.run(host=ns.host, port=ns.port, threaded=True)
     except KeyboardInterrupt:
         _LOG.info('Server stopped')
 
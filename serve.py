@@ -1,12 +1,31 @@
+try:
+    # eventlet serves HTTP and WebSockets from a single epoll loop. Blocking stdlib calls
+    # (sockets, locks, sleep, threads) have to be made green before anything else imports them.
+    import eventlet
+
+    eventlet.monkey_patch()
+except ImportError:
+    eventlet = None
+
 import argparse
+import array
+import functools
 import logging
 import sys
 from pathlib import Path
+import hashlib
 import json
+import math
+import mimetypes
+import os
+import threading
+import types
 
 from flask import Flask, send_from_directory, request, redirect, url_for, Response, jsonify
-import re
+import string
 from flask_socketio import SocketIO, emit
+from engineio import packet as engineio_packet
+from socketio import packet as socketio_packet
 
 
 try:
@@ -17,7 +36,96 @@ try:
 except Exception:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-10s %(levelname)-6s %(message)s")
 
+try:
+    # Much cheaper log records for our own per-request logging. Flask, Werkzeug and Socket.IO
+    # keep logging through the stdlib (and coloredlogs, if installed).
+    import picologging
+except ImportError:
+    picologging = None
+
+try:
+    # Much faster than the stdlib json module, for both persistence and Socket.IO packets
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Values for the fields a client leaves out of a box
+_BOX_DEFAULT = (0, 0, 1, 0, 0, 0, 0)
+
+
+def _coerce_float(v):
+    # NaN would slip through every range check below, and neither value is valid JSON
+    f = float(v)
+    if not math.isfinite(f):
+        raise ValueError("Value must be a finite number")
+    return f
+
+
+def _coerce_float_or_none(v):
+    return _coerce_float(v) if v is not None else None
+
+
+def _coerce_size(v):
+    size = _coerce_float_or_none(v)
+    if size is not None and (size > 100 or size < 0):
+        raise ValueError("Your big box is unacceptable.")
+    return size
+
+
+def _coerce_ratio(v):
+    r = _coerce_float(v)
+    if r <= 0.001 or r > 100:
+        raise ValueError("Your big box is not doing very well.")
+    return r
+
+
+# Scalar LiveData fields and the functions that validate and convert them
+_FIELD_SPECS = (
+    ('big_box', _coerce_size),
+    ('big_box_aspect_ratio', _coerce_ratio),
+    ('big_box_x', _coerce_float_or_none),
+    ('big_box_y', _coerce_float_or_none),
+)
+
+
+def _compile_field_updater(specs):
+    """Unroll the field specs into straight-line code that copies them from a payload into a dict"""
+    lines = ['def update_fields(target, data):']
+    namespace = {'_MISSING': object()}
+    for i, (key, coerce) in enumerate(specs):
+        namespace[f'_coerce_{i}'] = coerce
+        lines += [
+            f'    v = data.get({key!r}, _MISSING)',
+            f'    if v is not _MISSING:',
+            f'        target[{key!r}] = _coerce_{i}(v)',
+        ]
+    if not specs:
+        lines.append('    pass')
+    exec(compile('\n'.join(lines), '<update_fields>', 'exec'), namespace)
+    return namespace['update_fields']
+
+
+_update_fields = _compile_field_updater(_FIELD_SPECS)
+
+
 class LiveData:
+    __slots__ = ('_data', '_persist_path', '_snapshot', '_encoded', 'last_payload_fp', '_lock')
+
     def __init__(self):
         self._data = {
             'boxes': [],
@@ -27,15 +135,50 @@ class LiveData:
             'big_box_y': None,
         }
         self._persist_path = None
+        # Shallow copy of _data handed out by to_dict(), rebuilt after the next update
+        self._snapshot = None
+        # JSON encoding of the snapshot, built on first use
+        self._encoded = None
+        # hash() of the raw request body that produced the current state, if any
+        self.last_payload_fp = None
+        # Held while updating and while caching, so the background save never caches a
+        # half-applied update
+        self._lock = threading.RLock()
 
     def to_dict(self):
-        # Return a shallow copy so callers can't mutate internal state directly
-        return dict(self._data)
-
-    def update_from(self, data):
+        # Return a shallow copy so callers can't mutate internal state directly. The copy is
+        # shared between all readers until the next update, so treat it as read-only.
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = dict(self._data)
+                snapshot = self._snapshot
+        return snapshot
+
+    def encoded(self) -> bytes:
+        encoded = self._encoded
+        if encoded is None:
+            with self._lock:
+                if self._encoded is None:
+                    self._encoded = json_dumps(self.to_dict())
+                encoded = self._encoded
+        return encoded
+
+    def update_from(self, data, payload_fp=None):
+        """Validate and apply `data`, then remember `payload_fp` as the payload that produced it"""
         if not isinstance(data, dict):
             raise TypeError("Expected data to be a dict")
 
+        with self._lock:
+            # Invalidate before touching anything, a failed update may still have changed some fields
+            self._snapshot = None
+            self._encoded = None
+            self.last_payload_fp = None
+            self._apply(data)
+            self.last_payload_fp = payload_fp
+
+    def _apply(self, data):
         if 'boxes' in data:
             boxes = data.get('boxes')
             if not isinstance(boxes, list):
@@ -48,39 +191,28 @@ class LiveData:
             for idx, box in enumerate(boxes):
                 if not isinstance(box, (list, tuple)):
                     raise TypeError(f"Box at index {idx} must be a list/tuple")
-                vals = [0, 0, 1, 0, 0, 0, 0]
-                for i, v in enumerate(box):
+                if len(box) > len(_BOX_DEFAULT):
+                    raise ValueError(f"You can't fill your boxes with too much stuff.")
+                vals = list(_BOX_DEFAULT)
+                try:
+                    # Converts all the numbers in one C loop
+                    vals[:len(box)] = array.array('d', box).tolist()
+                except TypeError:
+                    # array rejects numeric strings, which float() still accepts
                     try:
-                        vnum = float(v)
-                        vals[i] = vnum
-                    except Exception:
+                        vals[:len(box)] = map(float, box)
+                    except (TypeError, ValueError, OverflowError):
                         raise ValueError(f"Box at index {idx} contains non-numeric value")
-                    if len(vals) > 7:
-                        raise ValueError(f"You can't fill your boxes with too much stuff.")
-                new_boxes.append(vals)
-
-            self._data['boxes'] = new_boxes
-
-        if 'big_box' in data:
-            size = float(data.get('big_box')) if data.get('big_box') is not None else None
-
-            if size > 100 or size < 0:
-                raise ValueError("Your big box is unacceptable.")
-
-            self._data['big_box'] = size
-
-        if 'big_box_aspect_ratio' in data:
-            r = float(data.get('big_box_aspect_ratio')) if data.get('big_box_aspect_ratio') is not None else None
+                except OverflowError:
+                    raise ValueError(f"Box at index {idx} contains non-numeric value")
+                if not all(map(math.isfinite, vals)):
+                    raise ValueError(f"Box at index {idx} contains non-finite value")
+                # Boxes are immutable once stored, so they can be shared by every snapshot
+                new_boxes.append(tuple(vals))
 
-            if r <= 0.001 or r > 100:
-                raise ValueError("Your big box is not doing very well.")
+            self._data['boxes'] = tuple(new_boxes)
 
-            self._data['big_box_aspect_ratio'] = r
-
-        if 'big_box_x' in data:
-            self._data['big_box_x'] = float(data.get('big_box_x')) if data.get('big_box_x') is not None else None
-        if 'big_box_y' in data:
-            self._data['big_box_y'] = float(data.get('big_box_y')) if data.get('big_box_y') is not None else None
+        _update_fields(self._data, data)
 
     def __str__(self):
         return f"LiveData({self.to_dict()})"
@@ -90,6 +222,9 @@ parser.add_argument("--port", "-p", type=int, default=8080, help="Port to listen
 parser.add_argument("--bind", "-b", default="0.0.0.0", help="Bind address")
 parser.add_argument("-q", "--quiet", action="store_true", help="Reduce logging output to WARNING")
 parser.add_argument("-d", "--debug", action="store_true", help="Enable DEBUG logging")
+parser.add_argument("--x-sendfile", action="store_true",
+                    help="Let a reverse proxy (e.g. Apache mod_xsendfile) send static files via X-Sendfile")
+parser.add_argument("--pretty-dump", action="store_true", help="Indent livedata.json so it is easier to read")
 
 args = parser.parse_args()
 
@@ -102,7 +237,13 @@ else:
 
 logging.getLogger().setLevel(level)
 
-logger = logging.getLogger("server")
+if picologging is not None:
+    # picologging doesn't support padded fields or the default asctime format
+    picologging.basicConfig(level=level, format="%(asctime)s %(name)s %(levelname)s %(message)s",
+                            datefmt="%Y-%m-%d %H:%M:%S")
+    logger = picologging.getLogger("server")
+else:
+    logger = logging.getLogger("server")
 
 
 directory_path = Path(__file__).parent.resolve()
@@ -111,14 +252,59 @@ if not directory_path.exists():
     sys.exit(2)
 
 
-# Create Flask app to serve static files from the script directory
-app = Flask(__name__, static_folder=str(directory_path), static_url_path="")
+# Create Flask app to serve static files from the script directory. Flask's own static route
+# would shadow serve_file() below, which serves the same directory from memory where it can.
+app = Flask(__name__, static_folder=None)
+
+# Behind a reverse proxy, only send the path and let it stream the file (zero-copy)
+app.config['USE_X_SENDFILE'] = args.x_sendfile
 
 # Configure Socket.IO. We allow CORS from anywhere for local development.
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Without eventlet, let flask-socketio pick gevent or Werkzeug's threaded development server.
+socketio_options = {
+    'cors_allowed_origins': "*",
+    'async_mode': 'eventlet' if eventlet is not None else None,
+}
+if orjson is not None:
+    # python-socketio only needs dumps/loads, and passes stdlib-only keyword arguments
+    _socketio_json = types.SimpleNamespace(
+        dumps=lambda obj, **kwargs: orjson.dumps(obj).decode('utf-8'),
+        loads=lambda data, **kwargs: orjson.loads(data),
+    )
+    socketio_options['json'] = _socketio_json
+socketio = SocketIO(app, **socketio_options)
+
+# Clients to send a broadcast to before yielding to other greenlets
+BROADCAST_BATCH = 50
+
+
+def broadcast_livedata(payload) -> None:
+    participants = list(socketio.server.manager.get_participants('/', None))
+    if len(participants) <= BROADCAST_BATCH:
+        socketio.emit('livedata', payload)
+        return
+    # Encode the packet once and hand the same Engine.IO packets to every client
+    pkt = socketio.server.packet_class(socketio_packet.EVENT, namespace='/', data=['livedata', payload])
+    encoded = pkt.encode()
+    if not isinstance(encoded, list):
+        encoded = [encoded]
+    eio_pkts = [engineio_packet.Packet(engineio_packet.MESSAGE, p) for p in encoded]
+    for i in range(0, len(participants), BROADCAST_BATCH):
+        for _, eio_sid in participants[i:i + BROADCAST_BATCH]:
+            for eio_pkt in eio_pkts:
+                socketio.server.eio.send_packet(eio_sid, eio_pkt)
+        socketio.sleep(0)
+
 
 class LiveDataStore:
-    OUTPUT_KEY_RE = re.compile(r'^[A-Za-z0-9-]{1,5}$')
+    # Output keys are 1-5 characters out of [A-Za-z0-9-]. Deleting those leaves nothing behind.
+    OUTPUT_KEY_MAX_LENGTH = 5
+    OUTPUT_KEY_STRIP = str.maketrans('', '', string.ascii_letters + string.digits + '-')
+    # Seconds to wait for more changes before writing the store to disk
+    SAVE_DELAY = 0.25
+
+    __slots__ = ('_data', '_current', '_preview', '_persist_path', 'pretty_dump',
+                 '_save_lock', '_save_pending', '_save_running')
 
     def __init__(self):
         # mapping from output key -> LiveData
@@ -126,13 +312,19 @@ class LiveDataStore:
         self._current = 'PRV'
         self._preview = 'PRV'
         self._persist_path = None
+        # Write an indented file instead of compact JSON
+        self.pretty_dump = False
+        self._save_lock = threading.Lock()
+        self._save_pending = False
+        self._save_running = False
 
     def validate_key(self, key: str) -> bool:
-        return isinstance(key, str) and bool(self.OUTPUT_KEY_RE.match(key))
+        return (isinstance(key, str) and 0 < len(key) <= self.OUTPUT_KEY_MAX_LENGTH
+                and not key.translate(self.OUTPUT_KEY_STRIP))
 
     def get_data_at(self, key: str) -> LiveData:
         if key not in self._data:
-            logging.getLogger('server').info(f'Creating new LiveData for output key: {key}')
+            logger.info('Creating new LiveData for output key: %s', key)
             self._data[key] = LiveData()
         return self._data[key]
 
@@ -172,18 +364,55 @@ class LiveDataStore:
 
     def save(self) -> None:
         try:
-            data = self.to_persist_dict()
-            with self._persist_path.open('w', encoding='utf-8') as fh:
-                json.dump(data, fh, ensure_ascii=False, indent=2)
+            # Write next to the file and rename, so a crash never leaves half a store behind
+            tmp_path = self._persist_path.with_name(self._persist_path.name + '.tmp')
+            with tmp_path.open('wb') as fh:
+                self._write_persisted(fh)
+            os.replace(tmp_path, self._persist_path)
         except Exception:
-            logging.getLogger('server').exception('Failed to save LiveDataStore')
+            logger.exception('Failed to save LiveDataStore')
+
+    def _write_persisted(self, fh) -> None:
+        if self.pretty_dump:
+            fh.write(json_dumps(self.to_persist_dict(), indent=True))
+            return
+        # Same document as to_persist_dict(), but each output is written from its cached
+        # encoding instead of copying every output into one big dict first
+        fh.write(b'{"current":' + json_dumps(self._current))
+        fh.write(b',"preview":' + json_dumps(self._preview))
+        fh.write(b',"outputs":{')
+        separator = b''
+        # The request handlers may add outputs while this runs in the background
+        for k, ld in list(self._data.items()):
+            fh.write(separator + json_dumps(k) + b':' + ld.encoded())
+            separator = b','
+        fh.write(b'}}')
+
+    def schedule_save(self) -> None:
+        """Save the store in the background, coalescing all changes made within SAVE_DELAY"""
+        with self._save_lock:
+            self._save_pending = True
+            if self._save_running:
+                return
+            self._save_running = True
+        socketio.start_background_task(self._save_worker)
+
+    def _save_worker(self) -> None:
+        socketio.sleep(self.SAVE_DELAY)
+        while True:
+            with self._save_lock:
+                if not self._save_pending:
+                    self._save_running = False
+                    return
+                self._save_pending = False
+            self.save()
 
     def load(self) -> None:
         try:
             if not self._persist_path.exists():
                 return
-            with self._persist_path.open('r', encoding='utf-8') as fh:
-                data = json.load(fh)
+            with self._persist_path.open('rb') as fh:
+                data = json_loads(fh.read())
                 cur = data.get('current', 'PRV')
                 outputs = data.get('outputs', {}) or {}
                 for k, v in outputs.items():
@@ -193,7 +422,7 @@ class LiveDataStore:
                             continue
                         ld = LiveData()
                         ld.update_from(v or {})
-                        logging.getLogger('server').debug(f'Loaded persisted LiveData for output {k}: {ld}')
+                        logger.debug('Loaded persisted LiveData for output %s: %s', k, ld)
                         self._data[k] = ld
                     except Exception:
                         logger.exception('Failed to load output %s', k)
@@ -203,7 +432,7 @@ class LiveDataStore:
                 if isinstance(preview_val, str) and self.validate_key(preview_val):
                     self._preview = preview_val
         except Exception:
-            logging.getLogger('server').exception('Failed to load persisted LiveDataStore')
+            logger.exception('Failed to load persisted LiveDataStore')
 
 
 live_store = LiveDataStore()
@@ -212,17 +441,40 @@ live_store = LiveDataStore()
 try:
     persist_file = directory_path / 'livedata.json'
     live_store._persist_path = persist_file
+    live_store.pretty_dump = args.pretty_dump
     live_store.load()
 except Exception:
     logger.exception('Failed to initialize persisted LiveDataStore')
 
 
+# Largest request body the API accepts, a full update with 4 boxes is well below this
+MAX_JSON_BODY = 4096
+
+
+def body_size_error():
+    """Return an error response if the request body can't be accepted without reading it"""
+    length = request.content_length
+    if length is None:
+        return jsonify({"error": "Content-Length required"}), 411
+    if length > MAX_JSON_BODY:
+        return jsonify({"error": "Payload too large"}), 413
+    return None
+
+
 @app.route('/api/set', methods=['POST'])
 def api_update_livedata():
     if not request.is_json:
         return jsonify({"error": "Expected application/json"}), 400
 
-    data = request.get_json()
+    size_error = body_size_error()
+    if size_error is not None:
+        return size_error
+
+    raw = request.get_data(cache=False)
+    try:
+        data = json_loads(raw)
+    except ValueError:
+        return jsonify({"error": "Invalid JSON"}), 400
 
     # determine output key from payload or use default
     output = data.get('output', 'PRV') if isinstance(data, dict) else 'PRV'
@@ -230,7 +482,12 @@ def api_update_livedata():
         if not live_store.validate_key(output):
             raise ValueError('Invalid output key')
         target = live_store.get_data_at(output)
-        target.update_from(data)
+        # Sliders resend the same values a lot. Updates replace whole fields, so the exact same
+        # body can't change anything and there's nothing to broadcast or save.
+        fp = hash(raw)
+        if target.last_payload_fp == fp:
+            return jsonify({}), 200
+        target.update_from(data, fp)
     except (ValueError, TypeError) as exc:
         logger.warning('Invalid data for LiveData update: %s', exc)
         return jsonify({"error": str(exc)}), 400
@@ -238,52 +495,140 @@ def api_update_livedata():
         logger.exception('Unexpected error while updating LiveData')
         return jsonify({"error": "Internal server error"}), 500
 
-    logger.info(f'LiveData updated for output {output}: {target}')
+    logger.info('LiveData updated for output %s: %s', output, target)
 
     try:
-        socketio.emit('livedata', live_store.get_data().to_dict())
+        broadcast_livedata(live_store.get_data().to_dict())
     except Exception:
         logger.exception('Failed to emit livedata')
 
     try:
-        live_store.save()
+        live_store.schedule_save()
     except Exception:
-        logging.getLogger('server').warning('Failed to persist LiveDataStore')
+        logger.warning('Failed to persist LiveDataStore')
 
     return jsonify({}), 200
 
 
+INDEX_FILE = 'index.html'
+
+# (directory mtime, index file exists, etag, body) as of the last request to /
+_index_cache = (None, False, None, None)
+
+
 @app.route("/")
 def index():
-    for fname in ("index.html", ):
-        fpath = directory_path / fname
-        if fpath.exists():
-            return send_from_directory(str(directory_path), fname)
-    # Otherwise list available html files as a simple index
-    items = [p.name for p in directory_path.iterdir() if p.suffix == ".html"]
-    body = "<h1>Available pages</h1>\n<ul>\n"
-    for it in sorted(items):
-        body += f"<li><a href=\"/{it}\">{it}</a></li>\n"
-    body += "</ul>"
-    return Response(body, mimetype="text/html")
+    global _index_cache
+    # Both whether index.html exists and the page listing only depend on file names, and the
+    # directory's mtime changes whenever one is added, removed or renamed.
+    key = directory_path.stat().st_mtime_ns
+    cached_key, has_index, etag, body = _index_cache
+    if cached_key != key:
+        has_index = (directory_path / INDEX_FILE).exists()
+        etag = body = None
+        if not has_index:
+            # Otherwise list available html files as a simple index
+            items = [p.name for p in directory_path.iterdir() if p.suffix == ".html"]
+            body = "<h1>Available pages</h1>\n<ul>\n"
+            for it in sorted(items):
+                body += f"<li><a href=\"/{it}\">{it}</a></li>\n"
+            body += "</ul>"
+            etag = hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest()
+        _index_cache = (key, has_index, etag, body)
+
+    if has_index:
+        return serve_file(INDEX_FILE)
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# Page assets that are kept in memory instead of being opened on every request
+STATIC_MANIFEST_SUFFIXES = ('.html', '.js', '.css', '.svg')
+
+
+@functools.lru_cache(maxsize=64)
+def _guess_type(suffix: str):
+    # Only a handful of suffixes are ever served, so keep mimetypes out of the request path
+    return mimetypes.guess_type('file' + suffix)
+
+
+def _mimetype(name: str):
+    """Return the content type for a file name, or None if it also needs a Content-Encoding"""
+    mimetype, encoding = _guess_type(os.path.splitext(name)[1].lower())
+    if encoding is not None:
+        return None
+    return mimetype or 'application/octet-stream'
+
+
+def _manifest_entry(path: Path):
+    mtime = path.stat().st_mtime
+    data = path.read_bytes()
+    etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return data, etag, mtime, _mimetype(path.name)
+
+
+def build_static_manifest(root: Path) -> dict:
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for name in filenames:
+            if not name.endswith(STATIC_MANIFEST_SUFFIXES):
+                continue
+            path = Path(dirpath) / name
+            try:
+                manifest[path.relative_to(root).as_posix()] = _manifest_entry(path)
+            except OSError:
+                logger.warning('Failed to read static file %s', path)
+    return manifest
+
+
+static_manifest = build_static_manifest(directory_path)
+logger.debug('Loaded %d static files into memory', len(static_manifest))
 
 
 @app.route('/<path:filename>')
 def serve_file(filename):
-    # Let Flask serve any file from the directory
-    return send_from_directory(str(directory_path), filename)
+    entry = static_manifest.get(filename)
+    if entry is None or app.config['USE_X_SENDFILE']:
+        # Let Flask serve any other file from the directory. The open file is handed to the WSGI
+        # server's wsgi.file_wrapper, which servers such as gunicorn send with sendfile()
+        return send_from_directory(str(directory_path), filename, mimetype=_mimetype(filename))
+
+    # The files are edited while the server runs, so reload them when their mtime changes
+    path = directory_path / filename
+    try:
+        mtime = path.stat().st_mtime
+        if mtime != entry[2]:
+            entry = static_manifest[filename] = _manifest_entry(path)
+    except OSError:
+        static_manifest.pop(filename, None)
+        return send_from_directory(str(directory_path), filename)
+
+    data, etag, mtime, mimetype = entry
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = mtime
+    max_age = app.get_send_file_max_age(filename)
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
 
 
 @socketio.on('connect')
 def on_connect():
-    sid = request.sid if hasattr(request, 'sid') else None
+    sid = request.sid
     logger.info('Socket Client connected: %s', sid)
     emit('server_message', {'message': 'connected'})
 
 
 @socketio.on('disconnect')
 def on_disconnect():
-    sid = request.sid if hasattr(request, 'sid') else None
+    sid = request.sid
     logger.info('Socket Client disconnected: %s', sid)
 
 
@@ -305,9 +650,7 @@ def on_get_livedata(_data=None):
         return current
     finally:
         try:
-            sid = request.sid if hasattr(request, 'sid') else None
-            if sid:
-                emit('livedata', current, room=sid)
+            emit('livedata', current, room=request.sid)
         except Exception:
             logger.debug('Failed to emit livedata to room')
 
@@ -318,7 +661,11 @@ def api_set_current():
         if not request.is_json:
             raise TypeError("Expected application/json")
 
-        data = request.get_json()
+        size_error = body_size_error()
+        if size_error is not None:
+            return size_error
+
+        data = json_loads(request.get_data(cache=False))
         if not isinstance(data, dict):
             raise TypeError("Expected JSON object")
 
@@ -332,32 +679,39 @@ def api_set_current():
         if preview_key is not None and not isinstance(preview_key, str):
             raise TypeError("Invalid 'preview' value")
 
+        before = (live_store.get_current_key(), live_store.get_preview_key())
+
         # Handle preview/transition logic: all fields optional
         if transition_present:
             # swap current and preview
             live_store.swap_current_and_preview()
-            logging.getLogger('server').info(f'Transitioned current and preview: current={live_store.get_current_key()}, preview={live_store.get_preview_key()}')
+            logger.info('Transitioned current and preview: current=%s, preview=%s',
+                        live_store.get_current_key(), live_store.get_preview_key())
             
         if output_key is not None:
             if not live_store.validate_key(output_key):
                 raise ValueError('Invalid output key')
             live_store.set_current_key(output_key)
-            logging.getLogger('server').info(f'Set current output to: {output_key}')
+            logger.info('Set current output to: %s', output_key)
 
         if preview_key is not None:
             if not live_store.validate_key(preview_key):
                 raise ValueError('Invalid preview output key')
             live_store.set_preview_key(preview_key)
-            logging.getLogger('server').info(f'Set preview output to: {preview_key}')
+            logger.info('Set preview output to: %s', preview_key)
+
+        # Nothing to persist or broadcast when the outputs are where they were
+        if (live_store.get_current_key(), live_store.get_preview_key()) == before:
+            return jsonify({}), 200
 
         # persist and emit new current livedata
         try:
-            live_store.save()
+            live_store.schedule_save()
         except Exception:
             logger.warning('Failed to persist LiveDataStore')
 
         current = live_store.get_data().to_dict()
-        socketio.emit('livedata', current)
+        broadcast_livedata(current)
 
         return jsonify({}), 200
     except Exception as exc:
@@ -374,10 +728,13 @@ def run():
     logger.info('Serving %s on http://%s:%s', directory_path, host, port)
     logger.info('Press Ctrl-C to stop')
     try:
-        # Use eventlet/gevent if installed; flask-socketio will pick the best available.
+        # With eventlet this runs eventlet.wsgi.server, otherwise gevent's or Werkzeug's server
+        logger.info('Using %s async mode', socketio.async_mode)
         socketio.run(app, host=host, port=port, debug=args.debug)
     except KeyboardInterrupt:
         logger.info('Shutting down server')
+        # Don't lose changes still waiting for a background save
+        live_store.save()
         sys.exit(0)
     except Exception as exc:  # pragma: no cover - defensive
         logger.exception('Server error: %s', exc)
@@ -0,0 +1,49 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope='module')
+def serve():
+    # serve.py parses its command line on import
+    argv = sys.argv
+    sys.argv = ['serve.py', '-q']
+    try:
+        yield importlib.import_module('serve')
+    finally:
+        sys.argv = argv
+
+
+@pytest.fixture
+def client(serve, monkeypatch):
+    # Keep the tests from writing livedata.json next to serve.py
+    monkeypatch.setattr(serve.LiveDataStore, 'schedule_save', lambda self: None)
+    return serve.app.test_client()
+
+
+@pytest.mark.parametrize('field', ['big_box', 'big_box_aspect_ratio', 'big_box_x', 'big_box_y'])
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf'])
+def test_set_rejects_non_finite_scalars(serve, client, field, value):
+    before = serve.live_store.get_data_at('TEST').to_dict()
+
+    response = client.post('/api/set', json={'output': 'TEST', field: value})
+
+    assert response.status_code == 400
+    assert serve.live_store.get_data_at('TEST').to_dict() == before
+
+
+def test_set_rejects_non_finite_box_values(client):
+    response = client.post('/api/set', json={'output': 'TEST', 'boxes': [[1, 'nan']]})
+    assert response.status_code == 400
+
+
+def test_set_accepts_finite_scalars(serve, client):
+    response = client.post('/api/set', json={'output': 'TEST', 'big_box': '50', 'big_box_x': 1, 'big_box_y': None})
+
+    assert response.status_code == 200
+    data = serve.live_store.get_data_at('TEST').to_dict()
+    assert (data['big_box'], data['big_box_x'], data['big_box_y']) == (50.0, 1.0, None)
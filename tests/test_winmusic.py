@@ -0,0 +1,81 @@
+import sys
+import types
+from pathlib import Path
+
+# pywinctl needs a desktop session to import, and none of these tests list windows
+sys.modules.setdefault('pywinctl', types.ModuleType('pywinctl'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+import winmusic  # noqa: E402
+
+
+def make_db(monkeypatch, tmp_path, pairs, cutoff):
+    """Build a MusicDB through create_music_database() for songs with these (author, title) tags."""
+    metas = {
+        str(tmp_path / f'{ix}.mp3'): {'author': author, 'title': title, 'purl': None, 'license': None}
+        for ix, (author, title) in enumerate(pairs)
+    }
+    monkeypatch.setattr(winmusic, 'iter_files', lambda root: iter(metas))
+    monkeypatch.setattr(winmusic, 'read_metadata', lambda p: dict(metas[p], path=p))
+    return winmusic.create_music_database(tmp_path, cutoff)
+
+
+SONGS = [
+    ('Kevin MacLeod', 'Monkeys Spinning Monkeys'),
+    ('Kevin MacLeod', 'Sneaky Snitch'),
+    ('Broke For Free', 'Night Owl'),
+    ('Chris Zabriskie', 'Cylinder Six'),
+    ('Podington Bear', 'Starling'),
+    ('Lee Rosevere', 'Let\'s Start at the Beginning'),
+]
+
+
+def test_trigram_index_only_used_when_it_can_prune(monkeypatch, tmp_path):
+    assert winmusic.trigram_index_useful(1)
+    assert winmusic.trigram_index_useful(2)
+    # The default --lev of 3 can destroy all trigrams of a MAX_COMPARE_LENGTH key
+    assert not winmusic.trigram_index_useful(3)
+
+    db = make_db(monkeypatch, tmp_path, SONGS, 3)
+    assert db.author_trigrams is None and db.title_trigrams is None
+    assert db.candidates(['kevin macl', 'sneaky sni'], 3) == range(len(SONGS))
+
+
+def test_trigram_candidates_reduce_the_candidate_set(monkeypatch, tmp_path):
+    cutoff = 2
+    db = make_db(monkeypatch, tmp_path, SONGS, cutoff)
+    assert db.author_trigrams is not None and db.title_trigrams is not None
+    parts = ['kevin macl', 'sneaky sni']
+
+    candidates = list(db.candidates(parts, cutoff))
+    assert len(candidates) < len(SONGS)
+    assert 1 in candidates
+
+    # Pruning never drops the match
+    everything = range(len(SONGS))
+    assert winmusic.find_match(db, parts, candidates, cutoff)[0] == winmusic.find_match(db, parts, everything, cutoff)[0] == 1
+
+
+def test_untagged_songs_never_match(monkeypatch, tmp_path):
+    db = make_db(monkeypatch, tmp_path, [(None, None), ('Kevin MacLeod', 'Sneaky Snitch')], 3)
+
+    # An empty key is within 3 edits of both short parts
+    assert winmusic.identify(db, ['Go - Foo'], 3) is None
+    assert winmusic.identify(db, ['Kevin MacLeod - Sneaky Snitch'], 3)['title'] == 'Sneaky Snitch'
+
+
+def test_mp4_title_without_artist_is_not_matched(monkeypatch, tmp_path):
+    tags = {
+        str(tmp_path / 'a.m4a'): {'©nam': ['Foo']},
+        str(tmp_path / 'b.m4a'): {'©nam': ['Sneaky Snitch'], '©ART': ['Kevin MacLeod']},
+    }
+    monkeypatch.setattr(winmusic, 'MutagenFile', lambda p: types.SimpleNamespace(tags=tags[p]))
+    monkeypatch.setattr(winmusic, 'iter_files', lambda root: iter(tags))
+
+    meta = winmusic.read_metadata(str(tmp_path / 'a.m4a'))
+    # ©nam is the title, not a fallback for the artist
+    assert (meta['author'], meta['title']) == (None, 'Foo')
+
+    db = winmusic.create_music_database(tmp_path, 3)
+    assert [song['title'] for song in db.songs] == ['Sneaky Snitch']
+    assert winmusic.identify(db, ['Go - Foo'], 3) is None